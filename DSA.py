@@ -1,19 +1,182 @@
-import shutil
-import gradio as gr
+# gradio and yaml are imported where used so DSA can be imported without loading them
+import concurrent.futures
+import copy
+import errno
+import io
 import json
+import logging
+import threading
 import time
+import uuid
 from conversation import Conversation
 from prompt_engineering.prompts import *
-import yaml
 from utils.utils import *
 import sys
 import os
 from horizon_client import HorizonClient
  
+try:
+    import orjson
+ 
+    def _dumps_line(obj):
+        return orjson.dumps(obj) + b'\n'
+ 
+    _loads_line = orjson.loads
+except ImportError:
+    def _dumps_line(obj):
+        return json.dumps(obj).encode('utf-8') + b'\n'
+ 
+    _loads_line = json.loads
+ 
+# Saved dialogues are append-only streams of [user, assistant] turns: msgpack when
+# available (smaller, faster to decode), NDJSON otherwise
+try:
+    import msgpack
+ 
+    _DIALOGUE_FILE = 'system_dialogue.msgpack'
+ 
+    def _pack_turn(turn):
+        return msgpack.packb(turn, use_bin_type=True)
+except ImportError:
+    msgpack = None
+    _DIALOGUE_FILE = 'system_dialogue.ndjson'
+    _pack_turn = _dumps_line
+ 
+ 
+def _read_dialogue(dialogue_path):
+    """(chat_history, filename) from the newest dialogue format present in dialogue_path"""
+    path = os.path.join(dialogue_path, 'system_dialogue.msgpack')
+    if msgpack is not None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return list(msgpack.Unpacker(f, raw=False)), 'system_dialogue.msgpack'
+    path = os.path.join(dialogue_path, 'system_dialogue.ndjson')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return [_loads_line(line) for line in f if line.strip()], 'system_dialogue.ndjson'
+    # Sessions saved before the append-only formats
+    with open(os.path.join(dialogue_path, 'system_dialogue.json'), 'r') as f:
+        return json.load(f), 'system_dialogue.json'
+ 
+# DSA_LOG=DEBUG brings back the verbose upload/report tracing; handlers are
+# left to the entry point (dsa_app*.py)
+logger = logging.getLogger(__name__)
+_log_level = os.environ.get('DSA_LOG', 'WARNING').upper()
+try:
+    logger.setLevel(_log_level)
+except ValueError:
+    logger.setLevel(logging.WARNING)
+    logger.warning("Ignoring invalid DSA_LOG=%r", _log_level)
+ 
+ 
+# Parsed config files keyed by (path, mtime_ns)
+_CFG_CACHE = {}
+ 
+ 
+def _load_cfg(path):
+    key = (path, os.stat(path).st_mtime_ns)
+    cfg = _CFG_CACHE.get(key)
+    if cfg is None:
+        import yaml
+        # libyaml's C loader when available; the pure-Python SafeLoader still beats
+        # FullLoader, which also registers arbitrary Python object constructors
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with open(path, 'rb') as f:
+            cfg = yaml.load(f, Loader=loader)
+        _CFG_CACHE[key] = cfg
+    return cfg
+ 
+ 
+def _abs_if_exists(path):
+    """Absolute path if it exists, else None (one stat instead of exists() + abspath())"""
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(path)
+ 
+ 
+def _kernel_copy(src, dst):
+    """Linux zero-copy: copy_file_range, then sendfile. Returns False if neither worked."""
+    remaining = os.stat(src).st_size
+    in_fd = os.open(src, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        out_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+        try:
+            try:
+                while remaining > 0:
+                    n = os.copy_file_range(in_fd, out_fd, remaining)
+                    if n == 0:
+                        break  # some FUSE/NFS/overlay mounts report 0 instead of failing
+                    remaining -= n
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+            if remaining == 0:
+                return True
+            # copy_file_range unsupported or stopped short; sendfile continues from the current offsets
+            try:
+                while remaining > 0:
+                    n = os.sendfile(out_fd, in_fd, None, remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+                return remaining == 0
+            except OSError:
+                return False
+        finally:
+            os.close(out_fd)
+    finally:
+        os.close(in_fd)
+ 
+ 
+def _fast_copy(src, dst_dir):
+    """Copy src into dst_dir (kernel-side on Linux, else a 1 MiB buffer) and return the new path"""
+    dst = os.path.join(dst_dir, os.path.basename(src))
+    try:
+        if os.path.samefile(src, dst):
+            return dst  # already in place; opening dst for writing would truncate src
+    except FileNotFoundError:
+        pass
+    if hasattr(os, 'copy_file_range') and sys.platform.startswith('linux'):
+        try:
+            if _kernel_copy(src, dst):
+                return dst
+        except OSError as e:
+            logger.warning("Kernel copy failed, falling back to buffered copy: %s", e)
+    buf = bytearray(1 << 20)
+    mv = memoryview(buf)
+    with open(src, 'rb') as r, open(dst, 'wb') as w:
+        while (n := r.readinto(buf)):
+            w.write(mv[:n])
+    return dst
+ 
  
 class DSA:
+    # Upload status HTML, filled in with str.format_map
+    _SUCCESS_TPL = """
+    <div style="background-color: #d4edda; border: 1px solid #c3e6cb; color: #155724; padding: 10px; border-radius: 5px; margin: 5px 0;">
+    <strong>✅ File Uploaded Successfully!</strong><br>
+    <strong>File:</strong> {filename}<br>
+    <strong>Size:</strong> {size:,} bytes<br>
+    <strong>Type:</strong> {ext}
+    </div>
+ 
+    """
+    _ERROR_TPL = """
+    <div style="background-color: #f8d7da; border: 1px solid #f5c6cb; color: #721c24; padding: 10px; border-radius: 5px; margin: 5px 0;">
+    <strong>❌ Upload Failed!</strong><br>
+    <strong>Error:</strong> {err}
+    </div>
+ 
+    """
+ 
     def __init__(self, config_path='config.yaml'):
-        print("Try to load config: ", config_path)
+        logger.debug("Try to load config: %s", config_path)
+ 
+        # Number of chat_history turns already appended to _DIALOGUE_FILE
+        self._saved_turn_count = 0
+        # Copy of the last turn written, to notice it being filled in after the save
+        self._last_saved_turn = None
  
         if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
             bundle_dir = os.path.dirname(sys.executable)
@@ -21,155 +184,223 @@ class DSA:
             bundle_dir = os.path.dirname(os.path.abspath(__file__))
         config_path = os.path.join(bundle_dir, config_path)
  
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.load(f, Loader=yaml.FullLoader)
+        # Deep copy: DSA mutates its config (session_cache_path, load_chat, ...)
+        self.config = copy.deepcopy(_load_cfg(config_path))
         if self.config["load_chat"] == True:
             self.load_dialogue(self.config["chat_history_path"])
         else:
             self.session_cache_path = self.init_local_cache_path(to_absolute_path(self.config["project_cache_path"]))
             self.config["session_cache_path"] = self.session_cache_path
-        print("Session cache path: ", self.session_cache_path)
+        logger.debug("Session cache path: %s", self.session_cache_path)
         self.conv = Conversation(self.config)
  
-        self.conv.programmer.messages = [
-            {
-                "role": "system",
-                "content": PROGRAMMER_PROMPT.format(working_path=self.session_cache_path)
-            }
-        ]
- 
+        # Static part of the programmer system prompt, formatted once
+        self._base_prompt = PROGRAMMER_PROMPT.format(working_path=self.session_cache_path)
         if self.conv.retrieval:
-            self.conv.programmer.messages[0]["content"] += KNOWLEDGE_INTEGRATION_SYSTEM
+            self._base_prompt += KNOWLEDGE_INTEGRATION_SYSTEM
  
+        # Uploaded datasets, rendered into the system prompt by _rebuild_system_prompt
+        self._datasets = []
+        self.conv.programmer.messages = [{"role": "system", "content": ""}]
+        self._rebuild_system_prompt()
  
-    def init_local_cache_path(self, project_cache_path):
-        current_fold = time.strftime('%Y-%m-%d', time.localtime())
-        hsid = str(hash(id(self)))  # new_uuid = str(uuid.uuid4())
-        session_cache_path = os.path.join(project_cache_path, current_fold + '-' + hsid)
-        if not os.path.exists(session_cache_path):
-            os.makedirs(session_cache_path)
-        return session_cache_path
+        # Dataset descriptions keyed by (abs_path, size, mtime_ns)
+        self._desc_cache = {}
  
-    def open_board(self):
-        data = self.conv.show_data()
-        if data.empty:
-            print("No data available to display")
-            return gr.Dataframe(visible=False)
-        else:
-            print(f"Displaying dataframe with {len(data)} rows and {len(data.columns)} columns")
-            return gr.Dataframe(value=data, visible=True)
+        # Dataset descriptions run here so uploads return right after the copy;
+        # a single worker keeps notification messages in upload order
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='dsa-desc')
+        self._pending_desc = []
+        self._prompt_lock = threading.Lock()
  
-    def add_file(self, files):
  
-        """Add file - COMPANY PRODUCTION VERSION"""
+    def init_local_cache_path(self, project_cache_path):
+        current_fold = time.strftime('%Y-%m-%d', time.localtime())
+        # uuid rather than id(self): ids are recycled after GC and could reuse another session's dir
+        session_cache_path = os.path.join(project_cache_path, current_fold + '-' + uuid.uuid4().hex[:12])
+        os.makedirs(session_cache_path, exist_ok=True)
+        return session_cache_path
  
-        file_path = files.name
+    @staticmethod
+    def _render(dataset):
+        filename, path = dataset['filename'], dataset['path']
+        return f"""
+   
+    🔥 CRITICAL - USER UPLOADED FILE 🔥
  
-        shutil.copy(file_path, self.session_cache_path)
+    Filename: {filename}
  
-        filename = os.path.basename(file_path)
+    Full Path: {path}
+   
+    IMPORTANT INSTRUCTIONS:
  
-        self.conv.add_data(file_path)
+    - When user asks about "the data" or "the dataset", they mean: {filename}
  
-        self.conv.file_list.append(filename)
+    - DO NOT look for files named 'data.csv'
  
-        local_cache_path = os.path.join(self.session_cache_path, filename)
+    - USE THIS EXACT PATH: {path}
  
-        # Get dataset information with truncation for large datasets
+    """
  
+    def _rebuild_system_prompt(self):
+        """Rebuild the system message from the base prompt plus one block per uploaded dataset"""
+        self.conv.programmer.messages[0]["content"] = self._base_prompt + "".join(self._render(d) for d in self._datasets)
+ 
+    def _register_dataset(self, filename, local_cache_path):
+        # Re-uploading the same file replaces its entry instead of appending a duplicate
+        self._datasets = [d for d in self._datasets if d['path'] != local_cache_path]
+        self._datasets.append({'path': local_cache_path, 'filename': filename})
+        self._rebuild_system_prompt()
+ 
+    @staticmethod
+    def _describe_truncated(desc, limit=2000):
+        """Render desc into at most `limit` chars, stopping as soon as the budget is spent"""
+        buf = io.StringIO()
+        items = desc.items() if isinstance(desc, dict) else [(None, desc)]
+        for k, v in items:
+            s = f"{k}: {v}\n" if k is not None else str(v)
+            room = limit - buf.tell()
+            if len(s) > room:
+                buf.write(s[:room])
+                buf.write(f"\n... (dataset info truncated to {limit} characters. Full data is still available for analysis.)")
+                logger.debug("Dataset info truncated to %d characters", limit)
+                break
+            buf.write(s)
+        return buf.getvalue()
+ 
+    @staticmethod
+    def _describe_csv_fast(path):
+        """Schema, head and null counts from the first pyarrow batch; None if pyarrow can't do it"""
+        try:
+            import pyarrow.csv as pa_csv
+            import pyarrow.compute as pa_compute
+        except ImportError:
+            return None
         try:
+            batch = pa_csv.open_csv(path).read_next_batch()
+        except Exception as e:  # pyarrow.ArrowInvalid, StopIteration on an empty file, ...
+            logger.warning("pyarrow could not parse %s, falling back to pandas: %s", path, e)
+            return None
+        nulls = {c: pa_compute.sum(pa_compute.is_null(batch.column(c))).as_py() for c in batch.schema.names}
+        return {
+            'schema': str(batch.schema),
+            'head': batch.slice(0, 5).to_pylist(),
+            f'nulls (first {batch.num_rows} rows)': nulls,
+        }
+ 
+    def _get_desc_cached(self, path, data_cache=None):
+        """Description of the dataset in data_cache (default: the current one), memoized per file version"""
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if key in self._desc_cache:
+            return self._desc_cache[key]
+        gen_info = None
+        if path.lower().endswith('.csv'):
+            gen_info = self._describe_csv_fast(path)
+        if gen_info is None:
+            if data_cache is None:
+                data_cache = self.conv.my_data_cache
+            gen_info = data_cache.get_description()
+        gen_info_str = self._describe_truncated(gen_info) if gen_info else "Dataset information not available"
+        self._desc_cache[key] = gen_info_str
+        return gen_info_str
+ 
+    def _wait_for_descriptions(self):
+        """Block until queued dataset descriptions have been added to the conversation"""
+        pending, self._pending_desc = self._pending_desc, []
+        concurrent.futures.wait(pending)
  
-            gen_info = self.conv.my_data_cache.get_description()
+    def open_board(self):
+        import gradio as gr
+        data = self.conv.show_data()
+        if data.empty:
+            logger.debug("No data available to display")
+            return gr.Dataframe(visible=False)
+        else:
+            logger.debug("Displaying dataframe with %d rows and %d columns", len(data), len(data.columns))
+            return gr.Dataframe(value=data, visible=True)
  
-            gen_info_str = str(gen_info) if gen_info else "Dataset information not available"
+    def _describe_and_register(self, file_path, filename, local_cache_path, data_cache):
  
-            # Truncate if too long (company datasets can be huge)
+        """Runs on self._pool: describe the upload and add the dataset notification message"""
  
-            max_length = 2000
+        # Get dataset information with truncation for large datasets
  
-            if len(gen_info_str) > max_length:
+        try:
  
-                gen_info_str = gen_info_str[:max_length] + f"\n... (dataset info truncated from {len(gen_info_str)} to {max_length} characters. Full data is still available for analysis.)"
+            # Truncated to 2000 chars while rendering (company datasets can be huge)
  
-                print(f"Dataset info truncated: {len(str(gen_info))} → {max_length} characters")
+            gen_info_str = self._get_desc_cached(file_path, data_cache)
  
         except Exception as e:
  
-            print(f"Warning: Could not get dataset description: {e}")
- 
-            import traceback
+            logger.warning("Could not get dataset description: %s", e, exc_info=True)
  
-            traceback.print_exc()
+            gen_info_str = "Dataset loaded successfully. You can use pd.read_csv() or pd.read_excel() to analyze it."
  
-            gen_info_str = "Dataset loaded successfully. You can use pd.read_csv() to analyze it."
- 
-        # ✅ CRITICAL FIX: Add dataset context as USER/ASSISTANT messages
- 
-        # NOT as system message append
+        # 2. Then, add as conversation messages (for chat flow)
  
         dataset_message = f"""Dataset Upload Notification:
  
-    File uploaded: {filename}
+        File uploaded: {filename}
  
-    Location: {local_cache_path}
-   
-    Dataset Information:
+        Location: {local_cache_path}
  
-    {gen_info_str}
-   
-    Important: Please analyze this dataset carefully, paying attention to missing values and data types of each column."""
-   
-        # Add as user message (like user is informing the AI)
+        Dataset Information:
  
-        self.conv.programmer.messages.append({
+        {gen_info_str}
  
-            "role": "user",
+        ⚠️ IMPORTANT: Use the file at {local_cache_path} for all data operations!"""
  
-            "content": dataset_message
+        with self._prompt_lock:
  
-        })
+            # Add as user message (like user is informing the AI)
  
-        # Add assistant acknowledgment
+            self.conv.programmer.messages.append({
  
-        self.conv.programmer.messages.append({
+                "role": "user",
  
-            "role": "assistant",
+                "content": dataset_message
  
-            "content": f"I've received the dataset '{filename}'. I can see the data structure and am ready to help you analyze it. What would you like to do first?"
+            })
  
-        })
+        # ❌ REMOVED: Assistant acknowledgment - causes SF Assist API to lose context
+        # self.conv.programmer.messages.append({
+        #     "role": "assistant",
+        #     "content": f"I've received the dataset '{filename}' located at {local_cache_path}. I can see the data structure and am ready to help you analyze it. What would you like to do first?"
+        # })
  
-        # Debug logging
+        # Debug logging (the verification scan is skipped unless DEBUG is enabled)
  
-        print("=" * 80)
+        if logger.isEnabledFor(logging.DEBUG):
  
-        print("DATASET CONTEXT ADDED AS CONVERSATION MESSAGES")
+            messages = self.conv.programmer.messages
  
-        print(f"System message size: {len(self.conv.programmer.messages[0]['content'])} chars (unchanged)")
+            logger.debug("File context added to system message + conversation: %s (system message %d chars, %d messages)",
+                         filename, len(messages[0]['content']), len(messages))
  
-        print(f"Total messages in conversation: {len(self.conv.programmer.messages)}")
+            if filename not in messages[0]["content"]:
  
-        print("=" * 80)
+                logger.debug("System message does NOT contain %s", filename)
  
-        print(f"Upload file in gradio path: {file_path}, local cache path: {local_cache_path}")
+            for idx, msg in enumerate(messages):
  
-    def add_file_with_feedback(self, files):
+                if 'Dataset Upload Notification' in msg.get('content', ''):
  
-        """Add file with status feedback - FIXED FOR SF ASSIST API + GPT-4"""
+                    logger.debug("Dataset upload message at index %d (role=%s, filename present=%s, path present=%s)",
+                                 idx, msg['role'], filename in msg['content'], local_cache_path in msg['content'])
  
-        if files is None:
+    def _ingest(self, file_path):
  
-            return gr.HTML(visible=False)
+        """Copy, load and register an uploaded file; the description runs in the background. Returns (status_html, ok)"""
  
         try:
  
-            file_path = files.name
- 
             filename = os.path.basename(file_path)
  
             # Copy file to session cache
  
-            shutil.copy(file_path, self.session_cache_path)
+            _fast_copy(file_path, self.session_cache_path)
  
             # Add data to conversation
  
@@ -179,227 +410,120 @@ class DSA:
  
             local_cache_path = os.path.join(self.session_cache_path, filename)
  
-            # Get dataset information with truncation for large datasets
- 
-            try:
- 
-                gen_info = self.conv.my_data_cache.get_description()
- 
-                gen_info_str = str(gen_info) if gen_info else "Dataset information not available"
- 
-                # Truncate if too long (company datasets can be huge)
- 
-                max_length = 2000
- 
-                if len(gen_info_str) > max_length:
- 
-                    gen_info_str = gen_info_str[:max_length] + f"\n... (dataset info truncated from {len(gen_info_str)} to {max_length} characters. Full data is still available for analysis.)"
- 
-                    print(f"Dataset info truncated: {len(str(gen_info))} → {max_length} characters")
- 
-            except Exception as e:
- 
-                print(f"Warning: Could not get dataset description: {e}")
- 
-                import traceback
- 
-                traceback.print_exc()
- 
-                gen_info_str = "Dataset loaded successfully. You can use pd.read_csv() or pd.read_excel() to analyze it."
- 
             # ✅ CRITICAL FIX FOR SF ASSIST API + GPT-4
  
             # GPT-4 needs file context in BOTH system message AND conversation
  
             # 1. First, add to system message (highest priority for GPT-4)
  
-            file_context_system = f"""
-   
-    🔥 CRITICAL - USER UPLOADED FILE 🔥
- 
-    Filename: {filename}
- 
-    Full Path: {local_cache_path}
-   
-    IMPORTANT INSTRUCTIONS:
- 
-    - When user asks about "the data" or "the dataset", they mean: {filename}
- 
-    - DO NOT look for files named 'data.csv'
- 
-    - USE THIS EXACT PATH: {local_cache_path}
- 
-    """
- 
-            self.conv.programmer.messages[0]["content"] += file_context_system
- 
-            # 2. Then, add as conversation messages (for chat flow)
- 
-            dataset_message = f"""Dataset Upload Notification:
- 
-        File uploaded: {filename}
- 
-        Location: {local_cache_path}
- 
-        Dataset Information:
- 
-        {gen_info_str}
- 
-        ⚠️ IMPORTANT: Use the file at {local_cache_path} for all data operations!"""
+            with self._prompt_lock:
+                self._register_dataset(filename, local_cache_path)
  
-            # Add as user message (like user is informing the AI)
- 
-            self.conv.programmer.messages.append({
+            # 2. Describe the dataset and add it to the conversation off the UI thread
  
-                "role": "user",
+            self._pending_desc.append(self._pool.submit(
+                self._describe_and_register, file_path, filename, local_cache_path, self.conv.my_data_cache))
+            
+            # 🔧 CHANGE #1: Set flag for file context injection on next question
+            self.conv.needs_file_context_injection = True
+            logger.debug("Next user question will have file context injected")
  
-                "content": dataset_message
+            # Create success status HTML
  
+            status_html = self._SUCCESS_TPL.format_map({
+                'filename': filename,
+                'size': os.path.getsize(file_path),
+                'ext': filename.rsplit('.', 1)[-1].upper(),
             })
  
-            # ❌ REMOVED: Assistant acknowledgment - causes SF Assist API to lose context
-            # self.conv.programmer.messages.append({
-            #     "role": "assistant",
-            #     "content": f"I've received the dataset '{filename}' located at {local_cache_path}. I can see the data structure and am ready to help you analyze it. What would you like to do first?"
-            # })
- 
-            # Debug logging
- 
-            print("=" * 80)
- 
-            print("✅ FILE CONTEXT ADDED TO SYSTEM MESSAGE + CONVERSATION")
- 
-            print(f"System message size: {len(self.conv.programmer.messages[0]['content'])} chars")
- 
-            print(f"File in system message: {filename}")
- 
-            print(f"Total messages: {len(self.conv.programmer.messages)}")
- 
-            print("=" * 80)
- 
-            # Verification debug
- 
-            print("\n" + "=" * 80)
- 
-            print("📝 VERIFICATION: DATASET MESSAGES ADDED")
- 
-            print("=" * 80)
+            logger.debug("Upload file in gradio path: %s, local cache path: %s", file_path, local_cache_path)
  
-            # Check system message
+            # Return the status HTML and whether the upload succeeded
  
-            if filename in self.conv.programmer.messages[0]["content"]:
+            return status_html, True
  
-                print(f"✓ System message contains: {filename}")
- 
-            else:
- 
-                print(f"✗ WARNING: System message does NOT contain {filename}")
- 
-            # Find and display the dataset upload messages
- 
-            for idx, msg in enumerate(self.conv.programmer.messages):
- 
-                if 'Dataset Upload Notification' in msg.get('content', ''):
- 
-                    print(f"✓ Found dataset upload message at index {idx}")
- 
-                    print(f"  Role: {msg['role']}")
- 
-                    print(f"  Filename present: {'✓' if filename in msg['content'] else '✗'}")
- 
-                    print(f"  Path present: {'✓' if local_cache_path in msg['content'] else '✗'}")
- 
-                elif "I've received the dataset" in msg.get('content', ''):
+        except Exception as e:
  
-                    print(f"✓ Found assistant acknowledgment at index {idx}")
+            logger.error("Upload failed for %s: %s", file_path, e)
  
-            print(f"\n📊 Total messages now: {len(self.conv.programmer.messages)}")
+            # Create error status HTML
  
-            print("=" * 80 + "\n")
-            
-            # 🔧 CHANGE #1: Set flag for file context injection on next question
-            self.conv.needs_file_context_injection = True
-            print(f"🔧 Next user question will have file context injected")
-            print("=" * 80 + "\n")
+            error_html = self._ERROR_TPL.format_map({'err': str(e)})
  
-            # Create success status HTML
+            # Return the error status HTML
  
-            status_html = f"""
-    <div style="background-color: #d4edda; border: 1px solid #c3e6cb; color: #155724; padding: 10px; border-radius: 5px; margin: 5px 0;">
-    <strong>✅ File Uploaded Successfully!</strong><br>
-    <strong>File:</strong> {filename}<br>
-    <strong>Size:</strong> {os.path.getsize(file_path):,} bytes<br>
-    <strong>Type:</strong> {filename.split('.')[-1].upper()}
-    </div>
+            return error_html, False
+   
  
-            """
+    def add_file(self, files):
  
-            print(f"Upload file in gradio path: {file_path}, local cache path: {local_cache_path}")
+        """Add file - COMPANY PRODUCTION VERSION"""
  
-            # Return only the status HTML
+        self._ingest(files.name)
  
-            return gr.HTML(value=status_html, visible=True)
+    def add_file_with_feedback(self, files):
  
-        except Exception as e:
+        """Add file with status feedback - FIXED FOR SF ASSIST API + GPT-4"""
  
-            # Create error status HTML
+        import gradio as gr
  
-            error_html = f"""
-    <div style="background-color: #f8d7da; border: 1px solid #f5c6cb; color: #721c24; padding: 10px; border-radius: 5px; margin: 5px 0;">
-    <strong>❌ Upload Failed!</strong><br>
-    <strong>Error:</strong> {str(e)}
-    </div>
+        if files is None:
  
-            """
+            return gr.HTML(visible=False)
  
-            # Return only the error status HTML
+        status_html, ok = self._ingest(files.name)
  
-            return gr.HTML(value=error_html, visible=True)
+        return gr.HTML(value=status_html, visible=True)
    
  
     def rendering_code(self):
         return self.conv.rendering_code()
  
     def generate_report(self, chat_history):
-        print(f"DEBUG: generate_report called with chat_history length: {len(chat_history) if chat_history else 0}")
+        import gradio as gr
+        logger.debug("generate_report called with chat_history length: %d", len(chat_history) if chat_history else 0)
         try:
             down_path = self.conv.document_generation(chat_history)
-            print(f"DEBUG: Report generated at path: {down_path}")
+            logger.debug("Report generated at path: %s", down_path)
             # Convert to absolute path and ensure it exists
-            abs_path = os.path.abspath(down_path)
-            if os.path.exists(abs_path):
-                print(f"DEBUG: File exists at: {abs_path}")
+            abs_path = _abs_if_exists(down_path)
+            if abs_path:
+                logger.debug("File exists at: %s", abs_path)
                 return [gr.Button(visible=False), gr.DownloadButton(label=f"Download Report", value=abs_path, visible=True)]
             else:
-                print(f"ERROR: File not found at: {abs_path}")
+                logger.error("File not found at: %s", down_path)
                 return [gr.Button(visible=True), gr.DownloadButton(visible=False)]
         except Exception as e:
-            print(f"ERROR in generate_report: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in generate_report: %s", e)
             # Return error state
             return [gr.Button(visible=True), gr.DownloadButton(visible=False)]
  
     def export_code(self):
+        import gradio as gr
         down_path = self.conv.export_code()
         # Convert to absolute path and ensure it exists
-        abs_path = os.path.abspath(down_path)
-        if os.path.exists(abs_path):
-            print(f"DEBUG: Notebook file exists at: {abs_path}")
+        abs_path = _abs_if_exists(down_path)
+        if abs_path:
+            logger.debug("Notebook file exists at: %s", abs_path)
             return [gr.Button(visible=False), gr.DownloadButton(label=f"Download Notebook", value=abs_path, visible=True)]
         else:
-            print(f"ERROR: Notebook file not found at: {abs_path}")
+            logger.error("Notebook file not found at: %s", down_path)
             return [gr.Button(visible=True), gr.DownloadButton(visible=False)]
  
     def down_report(self):
+        import gradio as gr
         return [gr.Button(visible=True), gr.DownloadButton(visible=False)]
  
     def down_notebook(self):
+        import gradio as gr
         return [gr.Button(visible=True), gr.DownloadButton(visible=False)]
    
    
     # 🔧 CHANGE #2: Modified chat_streaming to inject file context on first question only
     def chat_streaming(self, message, chat_history, code=None):
+        # Dataset notifications must land before the turn that refers to them, on both
+        # the question and the code path (stream_workflow starts right after this)
+        self._wait_for_descriptions()
         if not code:
             enhanced_message = message
             
@@ -421,11 +545,11 @@ User question: {message}
 
 Important: Use the uploaded file at {file_path} to answer this question."""
                     
-                    print(f"🔧 INJECTED FILE CONTEXT (first question): {latest_file}")
+                    logger.debug("Injected file context (first question): %s", latest_file)
                     
                     # Mark that context has been established - no need to inject again
                     self.conv.needs_file_context_injection = False
-                    print(f"✅ Context established - subsequent questions will work automatically")
+                    logger.debug("Context established - subsequent questions will work automatically")
             
             self.conv.programmer.messages.append({"role": "user", "content": enhanced_message})
         else:
@@ -434,14 +558,8 @@ Important: Use the uploaded file at {file_path} to answer this question."""
    
     def show_csv_download(self, filename):
         """Show CSV download link when specifically requested"""
-        # Check in session cache first
-        cache_path = os.path.join(self.session_cache_path, filename)
-        if os.path.exists(cache_path):
-            return f"📥 **{filename}** is available for download. Use the download buttons above to get the file."
-       
-        # Check in root directory
-        root_path = os.path.join(os.path.dirname(self.session_cache_path), filename)
-        if os.path.exists(root_path):
+        # Checks the session cache first, then the root directory
+        if self.get_csv_file_path(filename):
             return f"📥 **{filename}** is available for download. Use the download buttons above to get the file."
        
         return f"❌ {filename} not found"
@@ -449,16 +567,12 @@ Important: Use the uploaded file at {file_path} to answer this question."""
    
     def get_csv_file_path(self, filename):
         """Get CSV file path for download"""
-        # Check in session cache first
-        cache_path = os.path.join(self.session_cache_path, filename)
-        if os.path.exists(cache_path):
-            return os.path.abspath(cache_path)
-       
-        # Check in root directory
-        root_path = os.path.join(os.path.dirname(self.session_cache_path), filename)
-        if os.path.exists(root_path):
-            return os.path.abspath(root_path)
-       
+        # Check in session cache first, then in root directory
+        # One stat per directory (the kernel writes CSVs here at any time, so no caching)
+        for d in (self.session_cache_path, os.path.dirname(self.session_cache_path)):
+            path = _abs_if_exists(os.path.join(d, filename))
+            if path:
+                return path
         return None
    
     def get_csv_download_path(self):
@@ -492,12 +606,11 @@ Important: Use the uploaded file at {file_path} to answer this question."""
     def download_file(self):
         """Download file function for Gradio DownloadButton"""
         file_path = self.get_download_path()
-        if file_path and os.path.exists(file_path):
-            return file_path
-        return None
+        return _abs_if_exists(file_path) if file_path else None
    
     def show_csv_download_button(self):
         """Show CSV download button when files are available"""
+        import gradio as gr
         csv_path = self.get_csv_download_path()
         if csv_path:
             return [gr.DownloadButton("Download CSV", value=csv_path, visible=True)]
@@ -509,16 +622,28 @@ Important: Use the uploaded file at {file_path} to answer this question."""
  
     def save_dialogue(self, chat_history):
         self.conv.save_conv()
-        with open(os.path.join(self.session_cache_path, 'system_dialogue.json'), 'w') as f:
-            json.dump(chat_history, f, indent=4)
-        print(f"Dialogue saved in {os.path.join(self.session_cache_path, 'system_dialogue.json')}.")
+        dialogue_path = os.path.join(self.session_cache_path, _DIALOGUE_FILE)
+        # Append-only: one record per turn, only the turns added since the last save.
+        # If the history shrank (cleared/edited) or the last saved turn changed since
+        # (a save while its reply was still streaming), rewrite the file from scratch.
+        start = self._saved_turn_count
+        mode = 'ab'
+        if start > len(chat_history) or (start and list(chat_history[start - 1]) != self._last_saved_turn):
+            start, mode = 0, 'wb'
+        with open(dialogue_path, mode, buffering=1 << 20) as f:
+            for turn in chat_history[start:]:
+                f.write(_pack_turn(turn))
+        self._saved_turn_count = len(chat_history)
+        self._last_saved_turn = list(chat_history[-1]) if chat_history else None
+        logger.debug("Dialogue saved in %s.", dialogue_path)
  
     def load_dialogue(self, dialogue_path):
         try:
-            system_dialogue_path = os.path.join(dialogue_path, 'system_dialogue.json')
             system_config_path = os.path.join(dialogue_path, 'config.json')
-            with open(system_dialogue_path, 'r') as f:
-                chat_history = json.load(f)
+            chat_history, loaded_from = _read_dialogue(dialogue_path)
+            # Further saves append to the same file; an older format gets rewritten in full
+            self._saved_turn_count = len(chat_history) if loaded_from == _DIALOGUE_FILE else 0
+            self._last_saved_turn = list(chat_history[-1]) if self._saved_turn_count else None
             with open(system_config_path, 'r') as f:
                 sys_config = json.load(f)
             self.session_cache_path = sys_config["session_cache_path"]
@@ -527,11 +652,18 @@ Important: Use the uploaded file at {file_path} to answer this question."""
             self.config["figure_list"] = sys_config["figure_list"]
             return chat_history
         except Exception as e:
-            print(f"Failed to load the chat history: {e}")
+            logger.error("Failed to load the chat history: %s", e)
             return []
  
     def clear_all(self, message, chat_history):
+        self._wait_for_descriptions()
         self.conv.clear()
+        self._datasets = []
+        # programmer.clear() restored the raw, unformatted PROGRAMMER_PROMPT
+        self._rebuild_system_prompt()
+        # conv.clear() wipes the session dir, including the saved dialogue
+        self._saved_turn_count = 0
+        self._last_saved_turn = None
         return "", []
  
     def update_config(self, conv_model, programmer_model, inspector_model, api_key,
@@ -555,30 +687,17 @@ Important: Use the uploaded file at {file_path} to answer this question."""
  
         """Debug function to check system message"""
    
-        print("\n" + "=" * 80)
-   
-        print("DEBUG: SYSTEM MESSAGE CHECK")
-   
-        print("=" * 80)
-   
         if len(self.conv.programmer.messages) > 0:
        
             sys_msg = self.conv.programmer.messages[0]
+            content = sys_msg.get('content', '')
    
-            print(f"Role: {sys_msg.get('role')}")
-   
-            print(f"Content length: {len(sys_msg.get('content', ''))}")
-   
-            print(f"Content preview (first 500 chars):")
+            logger.debug("System message check: role=%s, content length=%d", sys_msg.get('role'), len(content))
    
-            print(sys_msg.get('content', '')[:500])
+            logger.debug("Content preview (first 500 chars):\n%s", content[:500])
    
-            print(f"\n...Content preview (last 500 chars):")
-   
-            print(sys_msg.get('content', '')[-500:])
+            logger.debug("Content preview (last 500 chars):\n...%s", content[-500:])
    
         else:
        
-            print("ERROR: No system message found!")
-   
-        print("=" * 80 + "\n")
+            logger.error("System message check: no system message found!")
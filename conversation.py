@@ -399,6 +399,9 @@ Please try again or contact support if the issue persists.
             self.config['api_key'] = api_key
             # Update Snowflake clients
             from snowflake_cortex_client import SnowflakeCortexClient
+            # Release the old clients' pooled connections before replacing them
+            for old_client in (self.client, self.programmer.client, self.inspector.client):
+                old_client.close()
             self.client = SnowflakeCortexClient(self.config)
             self.programmer.client = SnowflakeCortexClient(self.config)
             self.inspector.client = SnowflakeCortexClient(self.config)
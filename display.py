@@ -1,4 +1,3 @@
-import gradio
 import html
 import re
 import os
@@ -148,4 +148,6 @@ def launch_app():
 
 
 if __name__ == '__main__':
+    import logging
+    logging.basicConfig()
     launch_app()
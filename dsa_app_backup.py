@@ -11,11 +11,6 @@ print("🚀 Starting DSA Application...")
 start_time = time.time()
 # Set matplotlib backend before any other imports
 os.environ['MPLBACKEND'] = 'Agg'
-print("📊 Loading matplotlib...")
-# ... rest continues as before
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
- 
 print("🎨 Loading Gradio...")
 import gradio as gr
 print("🖼️ Loading frontend components...")
@@ -26,14 +21,20 @@ print("📦 Loading DSA core...")
 from DSA import DSA
 from utils.utils import to_absolute_path
  
-# Additional matplotlib configuration for Gradio compatibility
-print("🔧 Configuring matplotlib...")
-import matplotlib.pyplot as plt
-plt.ioff()  # Turn off interactive mode
- 
 print(f"✅ Libraries loaded in {time.time() - start_time:.2f} seconds")
  
+def _configure_mpl():
+    """Load and configure matplotlib only when the app is actually launched"""
+    print("📊 Loading matplotlib...")
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-interactive backend
+    # Additional matplotlib configuration for Gradio compatibility
+    print("🔧 Configuring matplotlib...")
+    import matplotlib.pyplot as plt
+    plt.ioff()  # Turn off interactive mode
+ 
 def launch_app():
+    _configure_mpl()
     print("🔵 DEBUG 1: Starting launch_app() function")
     
     print("🔵 DEBUG 2: Creating DSA instance...")
@@ -100,7 +101,8 @@ def launch_app():
             
             print("🔵 DEBUG 27: Setting up code button click handler...")
             code_btn.click(fn=dsa.chat_streaming, inputs=[msg, chatbot, code], outputs=[msg, chatbot]).then(
-                dsa.conv.stream_workflow, inputs=[chatbot, code], outputs=chatbot)
+                dsa.conv.stream_workflow, inputs=[chatbot, code], outputs=chatbot,
+                concurrency_limit=1, concurrency_id="llm")
             print("🔵 DEBUG 28: Code button handler set")
  
             print("🔵 DEBUG 29: Creating dataframe...")
@@ -112,17 +114,20 @@ def launch_app():
            
             print("🔵 DEBUG 31: Setting up event handlers...")
             upload_btn.upload(fn=clear_upload_status, outputs=upload_status).then(
-                fn=dsa.add_file_with_feedback, inputs=upload_btn, outputs=[upload_status]
+                fn=dsa.add_file_with_feedback, inputs=upload_btn, outputs=[upload_status],
+                concurrency_id="io"
             )
             print("🔵 DEBUG 32: Upload handler set")
             
             msg.submit(dsa.chat_streaming, [msg, chatbot], [msg, chatbot], queue=False).then(
-                dsa.conv.stream_workflow, chatbot, chatbot
+                dsa.conv.stream_workflow, chatbot, chatbot,
+                concurrency_limit=1, concurrency_id="llm"
             )
             print("🔵 DEBUG 33: Message submit handler set")
             
             submit.click(dsa.chat_streaming, [msg, chatbot], [msg, chatbot], queue=False).then(
-                dsa.conv.stream_workflow, chatbot, chatbot
+                dsa.conv.stream_workflow, chatbot, chatbot,
+                concurrency_limit=1, concurrency_id="llm"
             )
             print("🔵 DEBUG 34: Submit click handler set")
             
@@ -187,14 +192,15 @@ def launch_app():
     
     # Get all possible cache paths
     print("🔵 DEBUG 39: Setting up allowed paths...")
-    allowed_paths = [
+    # Deduplicated (order kept): Gradio checks every entry on each file-serve request
+    session_cache_path = os.path.abspath(dsa.session_cache_path)
+    allowed_paths = list(dict.fromkeys([
         to_absolute_path(dsa.config["project_cache_path"]),
         to_absolute_path("cache"),
-        to_absolute_path(dsa.session_cache_path),
-        dsa.session_cache_path,  # Direct session cache path
-        os.path.dirname(dsa.session_cache_path),  # Parent directory
+        session_cache_path,  # Session cache path
+        os.path.dirname(session_cache_path),  # Parent directory
         to_absolute_path(".")  # Project root
-    ]
+    ]))
     print("🔵 DEBUG 40: Allowed paths set")
    
     print("🔵 DEBUG 41: About to call demo.launch()...")
@@ -202,6 +208,11 @@ def launch_app():
     print("🚀 LAUNCHING GRADIO SERVER...")
     print("=" * 60)
     
+    # Separate LLM streams ("llm") from uploads ("io") so neither blocks the other.
+    # "llm" runs one stream at a time: every session shares the one DSA instance,
+    # its programmer messages and its code kernel.
+    demo.queue(default_concurrency_limit=4, max_size=32)
+ 
     # ✅ FIXED SETTINGS FOR EC2
     demo.launch(
         server_name="0.0.0.0",    # ✅ Listen on all interfaces (not 127.0.0.1)
@@ -215,6 +226,8 @@ def launch_app():
  
  
 if __name__ == '__main__':
+    import logging
+    logging.basicConfig()
     print("=" * 60)
     print("🎬 MAIN ENTRY POINT")
     print("=" * 60)
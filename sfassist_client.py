@@ -14,12 +14,151 @@ Payload Structure:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import functools
 import json
-from typing import List, Dict, Iterator, Optional
+import ssl
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import time
+from typing import List, Dict, Union
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+try:
+    import orjson  # C encoder/decoder, several times faster than stdlib json
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _json_loads = json.loads
+
+# One TLS context, built once at import and shared by every connection pool;
+# certificate checks stay off as with verify=False (corporate endpoint)
+_SSL_CTX = ssl.create_default_context()
+_SSL_CTX.check_hostname = False
+_SSL_CTX.verify_mode = ssl.CERT_NONE
+
+
+# Retry policy for both transports: failed connects and these gateway statuses
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MAX_RETRIES = 2
+_BACKOFF = 0.2
+
+
+class _TLSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all share _SSL_CTX"""
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _SSL_CTX
+        return super().init_poolmanager(*args, **kwargs)
+
+try:
+    import httpx  # HTTP/2 multiplexing needs the h2 extra: pip install "httpx[http2]"
+    import h2  # noqa: F401
+    _HTTPX_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+    _HTTPX_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+except ImportError:
+    httpx = None
+
+
+def _httpx_client(async_=False):
+    """httpx client on an HTTP/2 transport that retries failed connects"""
+    if async_:
+        transport_cls, client_cls = httpx.AsyncHTTPTransport, httpx.AsyncClient
+    else:
+        transport_cls, client_cls = httpx.HTTPTransport, httpx.Client
+    transport = transport_cls(http2=True, verify=_SSL_CTX, limits=_HTTPX_LIMITS,
+                              retries=_MAX_RETRIES)
+    return client_cls(timeout=_HTTPX_TIMEOUT, transport=transport)
+
+logger = logging.getLogger(__name__)
+
+# System prompt used when the conversation does not carry one
+DEFAULT_SYS_MSG = "You are a helpful AI assistant for data analysis and Python programming."
+_DEFAULT_SYS_MSG_BYTES = _json_dumps({"role": "system", "content": DEFAULT_SYS_MSG})
+
+# Client settings used when neither the config nor the caller provides them
+_DEFAULTS = {
+    'api_key': None,
+    'base_url': '',
+    'model': 'snowflake-llama-3.3-70b',
+    'app_id': 'aedl',
+    'aplctn_cd': 'aedl',
+    'app_lvl_prefix': '',
+    'session_id': 'dsa_session',
+}
+
+
+def _dict_config(src, section, defaults):
+    cfg = src[section] if section in src else src
+    get = cfg.get
+    return {key: get(key, default) for key, default in defaults.items()}
+
+
+def _object_config(src, section, defaults):
+    if not (hasattr(src, 'api_key') or hasattr(src, section)):
+        return None
+    cfg = getattr(src, section, src)
+    return {key: getattr(cfg, key, default) for key, default in defaults.items()}
+
+
+def _no_config(src, section, defaults):
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _build_init(config_type):
+    """Config extractor for one input type; the type checks run once per type"""
+    if issubclass(config_type, dict):
+        return _dict_config
+    if issubclass(config_type, (str, bytes, type(None))):
+        return _no_config  # an api_key (or nothing), not a config
+    return _object_config
+
+
+def _resolve_config(src, section, defaults):
+    """
+    Read the fields in `defaults` from src[section] / src.section, falling back to
+    the root of src. Returns None if src is not a config dict/object (i.e. an api_key).
+    """
+    return _build_init(type(src))(src, section, defaults)
+
+
+# Response content extractors in priority order: the first key present wins
+_EXTRACTORS = (
+    ('text', lambda d: d['text']),
+    ('response', lambda d: d['response']),
+    ('choices', lambda d: d['choices'][0].get('message', {}).get('content', '')),
+    ('message', lambda d: d['message'].get('content', '')),  # Horizon-style response
+    ('content', lambda d: d['content']),
+)
+
+
+# Content types of endpoints that stream incremental events instead of one JSON body
+_STREAM_CONTENT_TYPES = ('text/event-stream', 'application/x-ndjson', 'application/jsonl')
+
+
+def _is_streaming_response(response) -> bool:
+    content_type = response.headers.get('Content-Type', '')
+    return any(t in content_type for t in _STREAM_CONTENT_TYPES)
+
+
+def _event_text(event) -> str:
+    """Text carried by one streamed event (OpenAI-style delta or plain text fields)"""
+    if not isinstance(event, dict):
+        return ''
+    choices = event.get('choices')
+    if choices:
+        choice = choices[0]
+        return (choice.get('delta') or choice.get('message') or {}).get('content') or ''
+    for key in ('text', 'response', 'content'):
+        if isinstance(event.get(key), str):
+            return event[key]
+    return ''
+
 
 # ============================================================================
 #                         RESPONSE CLASSES
@@ -27,33 +166,58 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class UsageStats:
     """Token usage statistics"""
+    __slots__ = ('prompt_tokens', 'completion_tokens', 'total_tokens')
     def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0, total_tokens: int = 0):
         self.prompt_tokens = prompt_tokens
         self.completion_tokens = completion_tokens
         self.total_tokens = total_tokens
 
 
+class _Message:
+    """Complete message (response.choices[0].message)"""
+    __slots__ = ('role', 'content')
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+
+
+class _Delta:
+    """Incremental message content (chunk.choices[0].delta)"""
+    __slots__ = ('content',)
+    def __init__(self, content: str):
+        self.content = content
+
+
 class Choice:
     """Response choice"""
+    __slots__ = ('message', 'finish_reason', 'delta')
     def __init__(self, message: Dict[str, str], finish_reason: str = "stop"):
-        self.message = type('Message', (), message)()
+        content = message.get('content', '')
+        self.message = _Message(message.get('role', 'assistant'), content)
         self.finish_reason = finish_reason
-        self.delta = type('Delta', (), {'content': message.get('content', '')})()
+        self.delta = _Delta(content)
 
 
 class CompletionResponse:
     """Response from completion API"""
+    __slots__ = ('choices', 'usage')
     def __init__(self, content: str, usage: UsageStats):
         self.choices = [Choice({"role": "assistant", "content": content})]
         self.usage = usage
 
 
+class _ChunkChoice:
+    """Choice inside a StreamingChunk; only carries a delta"""
+    __slots__ = ('delta',)
+    def __init__(self, delta: _Delta):
+        self.delta = delta
+
+
 class StreamingChunk:
     """Streaming chunk response"""
+    __slots__ = ('choices',)
     def __init__(self, content: str):
-        delta = type('Delta', (), {'content': content})()
-        choice = type('Choice', (), {'delta': delta})()
-        self.choices = [choice]
+        self.choices = [_ChunkChoice(_Delta(content))]
 
 
 # ============================================================================
@@ -78,71 +242,105 @@ class SFAssistClient:
             model: Model name to use (optional, defaults from config)
         """
         # Handle both config object and individual parameters
-        if isinstance(config_or_api_key, dict):
-            # Config dict provided
-            config = config_or_api_key
-            
-            # Check if sfassist section exists
-            if 'sfassist' in config:
-                sfassist_config = config['sfassist']
-                self.api_key = sfassist_config.get('api_key')
-                self.base_url = sfassist_config.get('base_url', '').rstrip('/')
-                self.model = sfassist_config.get('model', 'snowflake-llama-3.3-70b')
-                self.app_id = sfassist_config.get('app_id', 'aedl')
-                self.aplctn_cd = sfassist_config.get('aplctn_cd', 'aedl')
-                self.app_lvl_prefix = sfassist_config.get('app_lvl_prefix', '')
-                self.session_id = sfassist_config.get('session_id', 'dsa_session')
-            else:
-                # Fallback to root level
-                self.api_key = config.get('api_key')
-                self.base_url = config.get('base_url', '').rstrip('/')
-                self.model = config.get('model', 'snowflake-llama-3.3-70b')
-                self.app_id = config.get('app_id', 'aedl')
-                self.aplctn_cd = config.get('aplctn_cd', 'aedl')
-                self.app_lvl_prefix = config.get('app_lvl_prefix', '')
-                self.session_id = config.get('session_id', 'dsa_session')
-                
-        elif hasattr(config_or_api_key, 'api_key') or hasattr(config_or_api_key, 'sfassist'):
-            # Config object provided
-            config = config_or_api_key
-            
-            # Check if sfassist attribute exists
-            if hasattr(config, 'sfassist'):
-                sfassist_config = config.sfassist
-                self.api_key = getattr(sfassist_config, 'api_key', None)
-                self.base_url = getattr(sfassist_config, 'base_url', '').rstrip('/')
-                self.model = getattr(sfassist_config, 'model', 'snowflake-llama-3.3-70b')
-                self.app_id = getattr(sfassist_config, 'app_id', 'aedl')
-                self.aplctn_cd = getattr(sfassist_config, 'aplctn_cd', 'aedl')
-                self.app_lvl_prefix = getattr(sfassist_config, 'app_lvl_prefix', '')
-                self.session_id = getattr(sfassist_config, 'session_id', 'dsa_session')
-            else:
-                # Fallback to root level attributes
-                self.api_key = getattr(config, 'api_key', None)
-                self.base_url = getattr(config, 'base_url', '').rstrip('/')
-                self.model = getattr(config, 'model', 'snowflake-llama-3.3-70b')
-                self.app_id = getattr(config, 'app_id', 'aedl')
-                self.aplctn_cd = getattr(config, 'aplctn_cd', 'aedl')
-                self.app_lvl_prefix = getattr(config, 'app_lvl_prefix', '')
-                self.session_id = getattr(config, 'session_id', 'dsa_session')
-        else:
+        values = _resolve_config(config_or_api_key, 'sfassist', _DEFAULTS)
+        if values is None:
             # Individual parameters provided
-            self.api_key = config_or_api_key
-            self.base_url = base_url.rstrip('/') if base_url else ''
-            self.model = model if model else 'snowflake-llama-3.3-70b'
-            self.app_id = 'aedl'
-            self.aplctn_cd = 'aedl'
-            self.app_lvl_prefix = ''
-            self.session_id = 'dsa_session'
+            values = dict(_DEFAULTS, api_key=config_or_api_key, base_url=base_url or '',
+                          model=model or _DEFAULTS['model'])
+        self.api_key = values['api_key']
+        self.base_url = (values['base_url'] or '').rstrip('/')
+        self.model = values['model']
+        self.app_id = values['app_id']
+        self.aplctn_cd = values['aplctn_cd']
+        self.app_lvl_prefix = values['app_lvl_prefix']
+        self.session_id = values['session_id']
         
         # Debug output
-        print(f"DEBUG INIT: api_key={'[SET]' if self.api_key else '[EMPTY]'}")
-        print(f"DEBUG INIT: base_url={self.base_url if self.base_url else '[EMPTY]'}")
-        print(f"DEBUG INIT: model={self.model}")
-        print(f"DEBUG INIT: app_id={self.app_id}, aplctn_cd={self.aplctn_cd}")
+        logger.debug("INIT: api_key=%s, base_url=%s, model=%s, app_id=%s, aplctn_cd=%s",
+                     '[SET]' if self.api_key else '[EMPTY]', self.base_url or '[EMPTY]',
+                     self.model, self.app_id, self.aplctn_cd)
+        
+        # Request headers never change after init (api_key is fixed)
+        self._headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Accept": "application/json"
+        }
+        
+        # Add API key to header if available
+        if self.api_key:
+            self._headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        # Static parts of every payload, built once (see _build_payload)
+        self._query_template = {
+            "application": {
+                "aplctn_cd": self.aplctn_cd,
+                "app_id": self.app_id,
+                "app_lvl_prefix": self.app_lvl_prefix,
+                "session_id": self.session_id
+            },
+            "model": {
+                "model": self.model,
+                "options": {}
+            },
+            "response_format": {
+                "type": "json",
+                "schema": {}
+            }
+        }
+        
+        # Request body up to the messages array, for requests that use the
+        # default system prompt (see _build_payload_bytes)
+        self._default_body_head = _json_dumps({
+            "query": {
+                **self._query_template,
+                "prompt": {"messages": []}
+            }
+        })[:-4]
+        
+        # One multiplexed HTTP/2 connection when httpx is installed, otherwise pooled
+        # keep-alive connections: either way the TLS handshake is paid once, not per request
+        self._http = None
+        self._ahttp = None  # created per event loop by the first async request on it
+        self._ahttp_loop = None
+        self._session = None
+        if httpx is not None:
+            self._http = _httpx_client()
+        else:
+            self._session = requests.Session()
+            # POST is not retried by default; the final 5xx still reaches _handle_response
+            adapter = _TLSAdapter(pool_connections=10, pool_maxsize=50,
+                                  max_retries=Retry(total=_MAX_RETRIES, backoff_factor=_BACKOFF,
+                                                    status_forcelist=_RETRY_STATUSES,
+                                                    allowed_methods=frozenset({'POST'}),
+                                                    raise_on_status=False))
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
         
         self.chat = self.ChatCompletion(self)
     
+    def close(self):
+        """Close pooled HTTP connections"""
+        if self._session is not None:
+            self._session.close()
+        if self._http is not None:
+            self._http.close()
+        if self._ahttp is not None:
+            # An AsyncClient can only be closed from its own loop
+            logger.warning("Async HTTP client still open; await aclose() before close()")
+            self._ahttp = self._ahttp_loop = None
+    
+    async def aclose(self):
+        """Close the async HTTP/2 client"""
+        if self._ahttp is not None:
+            await self._ahttp.aclose()
+            self._ahttp = self._ahttp_loop = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def _build_payload(self, messages: List[Dict[str, str]], system_message: str = None) -> Dict:
         """
         Build request payload - OFFICIAL STRUCTURE
@@ -164,97 +362,133 @@ class SFAssistClient:
         Returns:
             Payload dict for SF Assist API
         """
-        print(f"\n{'='*80}")
-        print(f"🔍 BUILDING PAYLOAD - OFFICIAL STRUCTURE")
-        print(f"{'='*80}")
-        
-        # Extract system message
+        # Extract system message and build the messages array in one pass;
+        # slot 0 is reserved for the system message
         sys_msg = system_message
-        filtered_messages = []
+        all_messages = [None]
         
         for msg in messages:
             if msg.get('role') == 'system':
                 if not sys_msg:
                     sys_msg = msg['content']
             else:
-                filtered_messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
+                all_messages.append(msg)  # passed through as-is; serialized right after
         
         # Default system message
         if not sys_msg:
-            sys_msg = "You are a helpful AI assistant for data analysis and Python programming."
+            sys_msg = DEFAULT_SYS_MSG
         
-        # Build messages array with system first
-        all_messages = [{"role": "system", "content": sys_msg}] + filtered_messages
+        # System first
+        all_messages[0] = {"role": "system", "content": sys_msg}
         
-        print(f"✅ Messages array: {len(all_messages)} messages")
-        print(f"   • System message: {len(sys_msg)} chars")
-        print(f"   • User/Assistant messages: {len(filtered_messages)}")
+        logger.debug("Messages array: %d messages (system message %d chars, %d user/assistant)",
+                     len(all_messages), len(sys_msg), len(all_messages) - 1)
         
         # Build payload - OFFICIAL STRUCTURE
+        # Static sections are shared from the template; only the prompt is new
         payload = {
             "query": {
-                "application": {
-                    "aplctn_cd": self.aplctn_cd,
-                    "app_id": self.app_id,
-                    "app_lvl_prefix": self.app_lvl_prefix,
-                    "session_id": self.session_id
-                },
+                **self._query_template,
                 "prompt": {
                     "messages": all_messages  # 🔥 Messages as array!
-                },
-                "model": {
-                    "model": self.model,
-                    "options": {}
-                },
-                "response_format": {
-                    "type": "json",
-                    "schema": {}
                 }
             }
         }
         
-        print(f"✅ Payload Structure:")
-        print(f"   • application.aplctn_cd: {self.aplctn_cd}")
-        print(f"   • application.app_id: {self.app_id}")
-        print(f"   • model.model: {self.model}")
-        print(f"   • prompt.messages: {len(all_messages)} messages")
-        print(f"{'='*80}\n")
-        
         return payload
     
-    def _make_request(self, payload: Dict) -> requests.Response:
-        """Make HTTP request to SF Assist API"""
-        headers = {
-            "Content-Type": "application/json; charset=utf-8",
-            "Accept": "application/json"
-        }
+    def _build_payload_bytes(self, messages: List[Dict[str, str]], system_message: str = None) -> bytes:
+        """
+        Serialized _build_payload that skips its filtering loop when it can
         
-        # Add API key to header if available
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        The usual conversation has one leading system message (or none); anything
+        else falls back to the filtering loop in _build_payload.
+        """
+        start = 1 if messages and messages[0].get('role') == 'system' else 0
+        conversation = messages[start:] if start else messages
+        if any(msg.get('role') == 'system' for msg in conversation):
+            return _json_dumps(self._build_payload(messages, system_message))
+        
+        sys_msg = system_message or (messages[0]['content'] if start else None)
+        if not sys_msg:
+            sys_msg = DEFAULT_SYS_MSG
+        
+        if sys_msg == DEFAULT_SYS_MSG:
+            # Only the conversation is encoded; head and system message are cached bytes
+            tail = _json_dumps(conversation)[1:-1] if conversation else b''
+            return b''.join((self._default_body_head, _DEFAULT_SYS_MSG_BYTES,
+                             b',' if tail else b'', tail, b']}}}'))
+        
+        return _json_dumps({
+            "query": {
+                **self._query_template,
+                "prompt": {
+                    "messages": [{"role": "system", "content": sys_msg}, *conversation]
+                }
+            }
+        })
+    
+    def _make_request(self, payload: Union[Dict, bytes], stream: bool = False) -> requests.Response:
+        """Make HTTP request to SF Assist API (stream=True leaves the body unread)"""
+        headers = self._headers
+        logger.debug("Making request to %s (headers: %s)", self.base_url, list(headers))
+        body = payload if isinstance(payload, bytes) else _json_dumps(payload)
         
-        print(f"DEBUG: Making request to {self.base_url}")
-        print(f"DEBUG: Headers: {list(headers.keys())}")
+        if self._http is not None:
+            request = self._http.build_request("POST", self.base_url, headers=headers,
+                                               content=body)
+            # Same status retries the requests adapter does
+            for attempt in range(_MAX_RETRIES + 1):
+                response = self._http.send(request, stream=stream)
+                if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                    break
+                response.close()
+                time.sleep(_BACKOFF * 2 ** attempt)
+            if stream and not _is_streaming_response(response):
+                response.read()  # plain JSON body: callers read .content directly
+            return response
         
-        response = requests.post(
+        response = self._session.post(
             self.base_url,
             headers=headers,
-            json=payload,
+            data=body,
             verify=False,
-            timeout=120
+            timeout=(5, 120),
+            stream=stream
         )
         
         return response
     
+    async def _amake_request(self, payload: Union[Dict, bytes], http=None):
+        """Async variant of _make_request over the shared HTTP/2 AsyncClient (needs httpx)"""
+        if http is None:
+            if httpx is None:
+                raise RuntimeError("Async requests need httpx: pip install 'httpx[http2]'")
+            # Pooled connections belong to the loop that opened them: a client from an
+            # earlier asyncio.run() would fail with "Event loop is closed"
+            loop = asyncio.get_running_loop()
+            if self._ahttp is None or self._ahttp_loop is not loop:
+                self._ahttp = _httpx_client(async_=True)
+                self._ahttp_loop = loop
+            http = self._ahttp
+        body = payload if isinstance(payload, bytes) else _json_dumps(payload)
+        for attempt in range(_MAX_RETRIES + 1):
+            response = await http.post(self.base_url, headers=self._headers, content=body)
+            if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                return response
+            await asyncio.sleep(_BACKOFF * 2 ** attempt)
+    
     class ChatCompletion:
         """Chat completion interface for SF Assist"""
         
         def __init__(self, client):
             self.client = client
-            self.completions = self  # Support OpenAI-style API
+            self._content_extractor = None  # extractor that matched the last response
+        
+        @property
+        def completions(self):
+            """Support OpenAI-style API (a property, so no self-reference cycle)"""
+            return self
         
         def create(self, model: str, messages: List[Dict[str, str]], 
                    stream: bool = False, **kwargs):
@@ -271,34 +505,76 @@ class SFAssistClient:
                 CompletionResponse object or Iterator[StreamingChunk] for streaming
             """
             # Build payload (messages as array - official structure!)
-            payload = self.client._build_payload(messages)
+            payload = self.client._build_payload_bytes(messages)
             
             # Make request
-            response = self.client._make_request(payload)
+            response = self.client._make_request(payload, stream=stream)
+            
+            return self._handle_response(response, stream)
+        
+        async def acreate(self, model: str, messages: List[Dict[str, str]], **kwargs):
+            """Async create() over the shared HTTP/2 AsyncClient (non-streaming)"""
+            payload = self.client._build_payload_bytes(messages)
+            response = await self.client._amake_request(payload)
+            return self._handle_response(response)
+        
+        def create_batch(self, batch: List[List[Dict[str, str]]],
+                         max_concurrency: int = 8) -> List[CompletionResponse]:
+            """
+            Run one non-streaming completion per message list concurrently
+            
+            Args:
+                batch: List of message lists, one per completion
+                max_concurrency: Maximum number of requests in flight
+                
+            Returns:
+                CompletionResponse objects in the order of batch
             
+            Blocks until the whole batch is done; async callers can instead
+            await asyncio.gather() over acreate() calls.
+            """
+            payloads = [self.client._build_payload_bytes(messages) for messages in batch]
+            if httpx is not None:
+                batch_run = self._gather_with_semaphore(payloads, max_concurrency)
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    return asyncio.run(batch_run)
+                # Inside a running event loop (async handler, Jupyter) asyncio.run() raises:
+                # run the batch on its own loop in a worker thread instead
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    return pool.submit(asyncio.run, batch_run).result()
+            # No httpx: fan out over the pooled requests session instead
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                responses = pool.map(self.client._make_request, payloads)
+                return [self._handle_response(response) for response in responses]
+        
+        async def _gather_with_semaphore(self, payloads: List[bytes], max_concurrency: int):
+            # A fresh AsyncClient per batch: pooled connections are bound to the
+            # event loop that asyncio.run() closes on return
+            semaphore = asyncio.Semaphore(max_concurrency)
+            async with _httpx_client(async_=True) as http:
+                async def post(payload):
+                    async with semaphore:
+                        return await self.client._amake_request(payload, http)
+                responses = await asyncio.gather(*[post(payload) for payload in payloads])
+            return [self._handle_response(response) for response in responses]
+        
+        def _handle_response(self, response, stream: bool = False):
+            """Turn an API response into a CompletionResponse (or StreamingChunk iterator)"""
             # Handle response
-            if response.status_code == 200:
+            if response.status_code == 200 and stream and _is_streaming_response(response):
+                # Real streaming endpoint: emit chunks as they arrive
+                return self._stream_response(response)
+            elif response.status_code == 200:
                 try:
                     # Try parsing as JSON first
-                    data = response.json()
+                    data = _json_loads(response.content)
                     
                     # Extract content from various possible response formats
-                    content = None
-                    if 'text' in data:
-                        content = data['text']
-                    elif 'response' in data:
-                        content = data['response']
-                    elif 'choices' in data and len(data['choices']) > 0:
-                        content = data['choices'][0].get('message', {}).get('content', '')
-                    elif 'message' in data:
-                        # Horizon-style response
-                        content = data['message'].get('content', '')
-                    elif 'content' in data:
-                        content = data['content']
-                    else:
-                        content = str(data)
+                    content = self._extract_content(data)
                     
-                    print(f"DEBUG: Response received ({len(content)} chars)")
+                    logger.debug("Response received (%d chars)", len(content))
                     
                     # Handle streaming vs non-streaming
                     if stream:
@@ -316,7 +592,7 @@ class SFAssistClient:
                 
                 except (json.JSONDecodeError, ValueError) as e:
                     # If not JSON, treat as plain text
-                    print(f"DEBUG: JSON decode error, treating as plain text: {e}")
+                    logger.debug("JSON decode error, treating as plain text: %s", e)
                     content = response.text
                     
                     if stream:
@@ -327,14 +603,60 @@ class SFAssistClient:
             
             else:
                 # Handle error responses
-                print(f"ERROR: Response status {response.status_code}")
-                print(f"ERROR: Response body: {response.text}")
+                logger.error("Response status %s: %s", response.status_code, response.text)
                 try:
                     error_data = response.json()
                     raise Exception(f"API Error Response: {json.dumps(error_data, indent=2)}")
                 except json.JSONDecodeError:
                     raise Exception(f"API Error Response ({response.status_code}): {response.text}")
         
+        def _extract_content(self, data) -> str:
+            """Response text, trying the extractor that matched last time first"""
+            extractor = self._content_extractor
+            if extractor is not None:
+                try:
+                    return extractor(data)
+                except (KeyError, IndexError, TypeError):
+                    pass  # response shape changed: rescan
+            for key, extractor in _EXTRACTORS:
+                if key in data:
+                    try:
+                        content = extractor(data)
+                    except IndexError:
+                        continue  # empty choices list
+                    self._content_extractor = extractor
+                    return content
+            return str(data)
+        
+        def _stream_response(self, response):
+            """
+            Yield StreamingChunk objects as events arrive on a streaming response
+            (SSE "data: {...}" lines or NDJSON), without buffering the whole body
+            """
+            if httpx is not None and isinstance(response, httpx.Response):
+                lines = response.iter_lines()
+            else:
+                # requests guesses ISO-8859-1 (or nothing) without a charset; these streams are UTF-8
+                lines = (line.decode('utf-8', 'replace') for line in response.iter_lines())
+            try:
+                for line in lines:
+                    if not line or line.startswith(':'):
+                        continue
+                    if line.startswith('data:'):
+                        line = line[5:].strip()
+                    if line == '[DONE]':
+                        break
+                    try:
+                        event = _json_loads(line)
+                    except ValueError:
+                        logger.debug("Skipping non-JSON stream line: %.100s", line)
+                        continue
+                    text = _event_text(event)
+                    if text:
+                        yield StreamingChunk(text)
+            finally:
+                response.close()
+        
         def _simulate_streaming(self, content: str):
             """
             Simulate streaming by yielding chunks of the response
@@ -345,12 +667,14 @@ class SFAssistClient:
             Yields:
                 StreamingChunk objects
             """
-            # Split content into words for more natural streaming
-            words = content.split(' ')
-            for i, word in enumerate(words):
-                # Add space before word except for first word
-                chunk_text = word if i == 0 else ' ' + word
-                yield StreamingChunk(chunk_text)
+            # Stream word by word, slicing lazily instead of splitting the whole text
+            start = 0
+            end = content.find(' ')
+            while end != -1:
+                yield StreamingChunk(content[start:end])
+                start = end  # every word after the first carries its leading space
+                end = content.find(' ', end + 1)
+            yield StreamingChunk(content[start:])
 
 
 def create_sfassist_client(api_key: str, base_url: str, model: str = "snowflake-llama-3.3-70b"):
@@ -1,15 +1,163 @@
 import requests
 
+from requests.adapters import HTTPAdapter
+
+from urllib3.util.retry import Retry
+
+import functools
+
 import json
 
-from typing import List, Dict, Iterator, Optional
+import ssl
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
 
 import time
+
+from typing import List, Dict, Union
+
+import urllib3
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+try:
+    import orjson  # C encoder/decoder, several times faster than stdlib json
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _json_loads = json.loads
+
+# One TLS context, built once at import and shared by every connection pool;
+# certificate checks stay off as with verify=False (corporate endpoint)
+_SSL_CTX = ssl.create_default_context()
+_SSL_CTX.check_hostname = False
+_SSL_CTX.verify_mode = ssl.CERT_NONE
+
+
+# Retry policy for both transports: failed connects and these gateway statuses
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MAX_RETRIES = 2
+_BACKOFF = 0.2
+
+
+class _TLSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all share _SSL_CTX"""
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _SSL_CTX
+        return super().init_poolmanager(*args, **kwargs)
+
+try:
+    import httpx  # HTTP/2 multiplexing needs the h2 extra: pip install "httpx[http2]"
+    import h2  # noqa: F401
+    _HTTPX_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+    _HTTPX_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+except ImportError:
+    httpx = None
+
+
+def _httpx_client(async_=False):
+    """httpx client on an HTTP/2 transport that retries failed connects"""
+    if async_:
+        transport_cls, client_cls = httpx.AsyncHTTPTransport, httpx.AsyncClient
+    else:
+        transport_cls, client_cls = httpx.HTTPTransport, httpx.Client
+    transport = transport_cls(http2=True, verify=_SSL_CTX, limits=_HTTPX_LIMITS,
+                              retries=_MAX_RETRIES)
+    return client_cls(timeout=_HTTPX_TIMEOUT, transport=transport)
+
+logger = logging.getLogger(__name__)
+
+# System prompt used when the conversation does not carry one
+DEFAULT_SYS_MSG = "You are a helpful AI assistant for data analysis and Python programming."
+_DEFAULT_SYS_MSG_BYTES = _json_dumps({"role": "system", "content": DEFAULT_SYS_MSG})
+
+# Client settings used when neither the config nor the caller provides them
+_DEFAULTS = {
+    'api_key': None,
+    'base_url': '',
+    'model': 'llama3.1-70b',
+    'app_id': 'edadip',
+    'aplctn_cd': 'edagnai',
+}
+
+
+def _dict_config(src, section, defaults):
+    cfg = src[section] if section in src else src
+    get = cfg.get
+    return {key: get(key, default) for key, default in defaults.items()}
+
+
+def _object_config(src, section, defaults):
+    if not (hasattr(src, 'api_key') or hasattr(src, section)):
+        return None
+    cfg = getattr(src, section, src)
+    return {key: getattr(cfg, key, default) for key, default in defaults.items()}
+
+
+def _no_config(src, section, defaults):
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _build_init(config_type):
+    """Config extractor for one input type; the type checks run once per type"""
+    if issubclass(config_type, dict):
+        return _dict_config
+    if issubclass(config_type, (str, bytes, type(None))):
+        return _no_config  # an api_key (or nothing), not a config
+    return _object_config
+
+
+def _resolve_config(src, section, defaults):
+    """
+    Read the fields in `defaults` from src[section] / src.section, falling back to
+    the root of src. Returns None if src is not a config dict/object (i.e. an api_key).
+    """
+    return _build_init(type(src))(src, section, defaults)
+
+
+# Response content extractors in priority order: the first key present wins
+_EXTRACTORS = (
+    ('text', lambda d: d['text']),
+    ('response', lambda d: d['response']),
+    ('choices', lambda d: d['choices'][0].get('message', {}).get('content', '')),
+)
+
+
+# Content types of endpoints that stream incremental events instead of one JSON body
+_STREAM_CONTENT_TYPES = ('text/event-stream', 'application/x-ndjson', 'application/jsonl')
+
+
+def _is_streaming_response(response) -> bool:
+    content_type = response.headers.get('Content-Type', '')
+    return any(t in content_type for t in _STREAM_CONTENT_TYPES)
+
+
+def _event_text(event) -> str:
+    """Text carried by one streamed event (OpenAI-style delta or plain text fields)"""
+    if not isinstance(event, dict):
+        return ''
+    choices = event.get('choices')
+    if choices:
+        choice = choices[0]
+        return (choice.get('delta') or choice.get('message') or {}).get('content') or ''
+    for key in ('text', 'response', 'content'):
+        if isinstance(event.get(key), str):
+            return event[key]
+    return ''
  
 class UsageStats:
 
     """Token usage statistics"""
 
+    __slots__ = ('prompt_tokens', 'completion_tokens', 'total_tokens')
+
     def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0, total_tokens: int = 0):
 
         self.prompt_tokens = prompt_tokens
@@ -18,39 +166,75 @@ class UsageStats:
 
         self.total_tokens = total_tokens
  
+class _Message:
+
+    """Complete message (response.choices[0].message)"""
+
+    __slots__ = ('role', 'content')
+
+    def __init__(self, role: str, content: str):
+
+        self.role = role
+
+        self.content = content
+ 
+class _Delta:
+
+    """Incremental message content (chunk.choices[0].delta)"""
+
+    __slots__ = ('content',)
+
+    def __init__(self, content: str):
+
+        self.content = content
+ 
 class Choice:
 
     """Response choice"""
 
+    __slots__ = ('message', 'finish_reason', 'delta')
+
     def __init__(self, message: Dict[str, str], finish_reason: str = "stop"):
 
-        self.message = type('Message', (), message)()
+        content = message.get('content', '')
+
+        self.message = _Message(message.get('role', 'assistant'), content)
 
         self.finish_reason = finish_reason
 
-        self.delta = type('Delta', (), {'content': message.get('content', '')})()
+        self.delta = _Delta(content)
  
 class CompletionResponse:
 
     """Response from completion API"""
 
+    __slots__ = ('choices', 'usage')
+
     def __init__(self, content: str, usage: UsageStats):
 
         self.choices = [Choice({"role": "assistant", "content": content})]
 
         self.usage = usage
  
+class _ChunkChoice:
+
+    """Choice inside a StreamingChunk; only carries a delta"""
+
+    __slots__ = ('delta',)
+
+    def __init__(self, delta: _Delta):
+
+        self.delta = delta
+ 
 class StreamingChunk:
 
     """Streaming chunk response"""
 
-    def __init__(self, content: str):
-
-        delta = type('Delta', (), {'content': content})()
+    __slots__ = ('choices',)
 
-        choice = type('Choice', (), {'delta': delta})()
+    def __init__(self, content: str):
 
-        self.choices = [choice]
+        self.choices = [_ChunkChoice(_Delta(content))]
  
 class SnowflakeCortexClient:
 
@@ -78,189 +262,250 @@ class SnowflakeCortexClient:
 
         # Handle both config object and individual parameters
 
-        if isinstance(config_or_api_key, dict):
-
-            # Config dict provided
-
-            config = config_or_api_key
-
-            # Check if snowflake section exists
+        defaults = _DEFAULTS
 
-            if 'snowflake' in config:
+        if isinstance(config_or_api_key, dict) and 'snowflake' in config_or_api_key:
 
-                snowflake_config = config['snowflake']
+            # A 'snowflake' config section has always defaulted to the Snowflake-hosted model
 
-                self.api_key = snowflake_config.get('api_key')
+            defaults = dict(_DEFAULTS, model='snowflake-llama-3.3-70b')
 
-                self.base_url = snowflake_config.get('base_url', '').rstrip('/')
+        values = _resolve_config(config_or_api_key, 'snowflake', defaults)
 
-                self.model = snowflake_config.get('model', 'snowflake-llama-3.3-70b')
-
-                self.app_id = snowflake_config.get('app_id', 'edadip')
-
-                self.aplctn_cd = snowflake_config.get('aplctn_cd', 'edagnai')
-
-            else:
+        if values is None:
 
-                # Fallback to root level
-
-                self.api_key = config.get('api_key')
-
-                self.base_url = config.get('base_url', '').rstrip('/')
-
-                self.model = config.get('model', 'llama3.1-70b')
-
-                self.app_id = config.get('app_id', 'edadip')
-
-                self.aplctn_cd = config.get('aplctn_cd', 'edagnai')
-
-        elif hasattr(config_or_api_key, 'api_key') or hasattr(config_or_api_key, 'snowflake'):
-
-            # Config object provided
-
-            config = config_or_api_key
-
-            # Check if snowflake attribute exists
+            # Individual parameters provided
 
-            if hasattr(config, 'snowflake'):
+            values = dict(_DEFAULTS, api_key=config_or_api_key, base_url=base_url or '',
+                          model=model or _DEFAULTS['model'])
 
-                snowflake_config = config.snowflake
+        self.api_key = values['api_key']
 
-                self.api_key = getattr(snowflake_config, 'api_key', None)
+        self.base_url = (values['base_url'] or '').rstrip('/')
 
-                self.base_url = getattr(snowflake_config, 'base_url', '').rstrip('/')
+        self.model = values['model']
 
-                self.model = getattr(snowflake_config, 'model', 'llama3.1-70b')
+        self.app_id = values['app_id']
 
-                self.app_id = getattr(snowflake_config, 'app_id', 'edadip')
+        self.aplctn_cd = values['aplctn_cd']
 
-                self.aplctn_cd = getattr(snowflake_config, 'aplctn_cd', 'edagnai')
+        # Debug output
 
-            else:
+        logger.debug("INIT: api_key=%s, base_url=%s, model=%s",
+                     '[SET]' if self.api_key else '[EMPTY]', self.base_url or '[EMPTY]', self.model)
 
-                # Fallback to root level attributes
+        # Request headers never change after init (api_key is fixed)
 
-                self.api_key = getattr(config, 'api_key', None)
+        self._headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Accept": "application/json",
+            "api-key": self.api_key,  # ✅ ADD THIS - API key in header!
+            "Authorization": f'Snowflake Token="{self.api_key}"'
+        }
 
-                self.base_url = getattr(config, 'base_url', '').rstrip('/')
+        # Static parts of every payload, built once (see _build_payload)
+
+        self._query_template = {
+            "aplctn_cd": self.aplctn_cd,
+            "app_id": self.app_id,
+            "api_key": self.api_key,
+            "method": "cortex",
+            "model": {
+                "name": self.model,
+                "provider": "anthropic"
+            },
+            "limit_convs": 0,
+            "app_lvl_prefix": "edadip",
+            "user_id": "",
+            "session_id": "dsa_session"
+        }
 
-                self.model = getattr(config, 'model', 'llama3.1-70b')
+        # Request body up to the messages array, for requests that use the
+        # default system prompt (see _build_payload_bytes)
 
-                self.app_id = getattr(config, 'app_id', 'edadip')
+        self._default_body_head = _json_dumps({
+            "query": {
+                **self._query_template,
+                "sys_msg": DEFAULT_SYS_MSG,
+                "prompt": {"messages": []}
+            }
+        })[:-4]
 
-                self.aplctn_cd = getattr(config, 'aplctn_cd', 'edagnai')
+        # One multiplexed HTTP/2 connection when httpx is installed, otherwise pooled
+        # keep-alive connections: either way the TLS handshake is paid once, not per request
 
+        self._http = None
+        self._ahttp = None  # created per event loop by the first async request on it
+        self._ahttp_loop = None
+        self._session = None
+        if httpx is not None:
+            self._http = _httpx_client()
         else:
+            self._session = requests.Session()
+            # POST is not retried by default; the final 5xx still reaches _handle_response
+            adapter = _TLSAdapter(pool_connections=10, pool_maxsize=50,
+                                  max_retries=Retry(total=_MAX_RETRIES, backoff_factor=_BACKOFF,
+                                                    status_forcelist=_RETRY_STATUSES,
+                                                    allowed_methods=frozenset({'POST'}),
+                                                    raise_on_status=False))
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
 
-            # Individual parameters provided
-
-            self.api_key = config_or_api_key
-
-            self.base_url = base_url.rstrip('/') if base_url else ''
+        self.chat = self.ChatCompletion(self)
 
-            self.model = model if model else 'llama3.1-70b'
+    def close(self):
 
-            self.app_id = 'edadip'
+        """Close pooled HTTP connections"""
 
-            self.aplctn_cd = 'edagnai'
+        if self._session is not None:
+            self._session.close()
+        if self._http is not None:
+            self._http.close()
+        if self._ahttp is not None:
+            # An AsyncClient can only be closed from its own loop
+            logger.warning("Async HTTP client still open; await aclose() before close()")
+            self._ahttp = self._ahttp_loop = None
 
-        # Debug output
+    async def aclose(self):
+        """Close the async HTTP/2 client"""
+        if self._ahttp is not None:
+            await self._ahttp.aclose()
+            self._ahttp = self._ahttp_loop = None
 
-        print(f"DEBUG INIT: api_key={'[SET]' if self.api_key else '[EMPTY]'}")
+    def __enter__(self):
 
-        print(f"DEBUG INIT: base_url={self.base_url if self.base_url else '[EMPTY]'}")
+        return self
 
-        print(f"DEBUG INIT: model={self.model}")
+    def __exit__(self, exc_type, exc_value, traceback):
 
-        self.chat = self.ChatCompletion(self)
+        self.close()
  
 
     def _build_payload(self, messages: List[Dict[str, str]], system_message: str = None) -> Dict:
         """Build request payload for Snowflake Cortex in company-specific format"""
-        # Extract system message
+        # Extract system message and build the messages array in one pass;
+        # slot 0 is reserved for the system message
         sys_msg = system_message
-        filtered_messages = []
+        all_messages = [None]
         # ✅ DEBUG: Check what we received
-        print(f"DEBUG _build_payload: Received system_message = {system_message is not None}")
-        print(f"DEBUG _build_payload: Number of messages = {len(messages)}")
+        logger.debug("_build_payload: system_message given=%s, %d messages", system_message is not None, len(messages))
         for msg in messages:
             if msg.get('role') == 'system':
                 if not sys_msg:
                     sys_msg = msg['content']
-                    print(f"DEBUG: Extracted sys_msg from messages, length = {len(sys_msg)}")
+                    logger.debug("Extracted sys_msg from messages, length = %d", len(sys_msg))
             else:
                 # Keep user and assistant messages
-                filtered_messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
+                all_messages.append(msg)  # passed through as-is; serialized right after
         # Default system message
         if not sys_msg:
-            sys_msg = "You are a helpful AI assistant for data analysis and Python programming."
-            print("DEBUG: Using default system message")
+            sys_msg = DEFAULT_SYS_MSG
+            logger.debug("Using default system message")
         # ✅ DEBUG: Check sys_msg before payload
-        print(f"DEBUG: sys_msg is None? {sys_msg is None}")
-        print(f"DEBUG: sys_msg length: {len(sys_msg) if sys_msg else 0}")
-        print(f"DEBUG: sys_msg preview: {sys_msg[:100] if sys_msg else 'NONE!'}")
-        # Keep last 10 messages for better context
-        if len(filtered_messages) > 10:
-            print(f"DEBUG: Trimming conversation from {len(filtered_messages)} to 10 messages")
-            filtered_messages = filtered_messages[-10:]
+        logger.debug("sys_msg length: %d, preview: %.100s", len(sys_msg), sys_msg)
+        # Keep last 10 messages for better context (dropped in place, system slot kept)
+        if len(all_messages) > 11:
+            logger.debug("Trimming conversation from %d to 10 messages", len(all_messages) - 1)
+            del all_messages[1:-10]
         # ✅ CRITICAL: Include system message in BOTH places!
-        all_messages = [
-            {
-                "role": "system",
-                "content": sys_msg
-            }
-        ] + filtered_messages
+        all_messages[0] = {
+            "role": "system",
+            "content": sys_msg
+        }
         # Build payload
+        # Static fields are shared from the template; only sys_msg and prompt are new
         payload = {
             "query": {
-                "aplctn_cd": self.aplctn_cd,
-                "app_id": self.app_id,
-                "api_key": self.api_key,
-                "method": "cortex",
-                "model":{
-                    "name":self.model,
-                    "provider":"anthropic"
-                },
+                **self._query_template,
                 "sys_msg": sys_msg,  # ✅ Keep this field for API backend!
-                "limit_convs": 0,
                 "prompt": {
                     "messages": all_messages  # ✅ AND include in messages array for LLM!
-                },
-                "app_lvl_prefix": "edadip",
-                "user_id": "",
-                "session_id": "dsa_session"
+                }
             }
         }
-        # ✅ DEBUG: Verify payload
-        print(f"DEBUG: Payload sys_msg is None? {payload['query']['sys_msg'] is None}")
         return payload
  
-    def _make_request(self, payload: Dict) -> requests.Response:
+    def _build_payload_bytes(self, messages: List[Dict[str, str]], system_message: str = None) -> bytes:
+        """
+        Serialized _build_payload that skips its filtering loop when it can
+
+        The usual conversation has one leading system message (or none); anything
+        else falls back to the filtering loop in _build_payload.
+        """
+        start = 1 if messages and messages[0].get('role') == 'system' else 0
+        conversation = messages[start:] if start else messages
+        if any(msg.get('role') == 'system' for msg in conversation):
+            return _json_dumps(self._build_payload(messages, system_message))
+        sys_msg = system_message or (messages[0]['content'] if start else None)
+        if not sys_msg:
+            sys_msg = DEFAULT_SYS_MSG
+        # Keep last 10 messages for better context
+        if len(conversation) > 10:
+            conversation = conversation[-10:]
+        if sys_msg == DEFAULT_SYS_MSG:
+            # Only the conversation is encoded; head and system message are cached bytes
+            tail = _json_dumps(conversation)[1:-1] if conversation else b''
+            return b''.join((self._default_body_head, _DEFAULT_SYS_MSG_BYTES,
+                             b',' if tail else b'', tail, b']}}}'))
+        return _json_dumps({
+            "query": {
+                **self._query_template,
+                "sys_msg": sys_msg,
+                "prompt": {
+                    "messages": [{"role": "system", "content": sys_msg}, *conversation]
+                }
+            }
+        })
+ 
+    def _make_request(self, payload: Union[Dict, bytes], stream: bool = False) -> requests.Response:
             
-        """Make HTTP request to Snowflake Cortex API"""
-        headers = {
-        
-            "Content-Type": "application/json; charset=utf-8",
-            "Accept": "application/json",
-            "api-key": self.api_key,  # ✅ ADD THIS - API key in header!
-            "Authorization": f'Snowflake Token="{self.api_key}"'
-        }
-        print(f"DEBUG: Making request to {self.base_url}")
-        print(f"DEBUG: Headers: {list(headers.keys())}")
-        print(f"DEBUG: Payload: {json.dumps(payload, indent=2)}")
-        response = requests.post(
+        """Make HTTP request to Snowflake Cortex API (stream=True leaves the body unread)"""
+        headers = self._headers
+        logger.debug("Making request to %s (headers: %s)", self.base_url, list(headers))
+        body = payload if isinstance(payload, bytes) else _json_dumps(payload)
+        if self._http is not None:
+            request = self._http.build_request("POST", self.base_url, headers=headers,
+                                               content=body)
+            # Same status retries the requests adapter does
+            for attempt in range(_MAX_RETRIES + 1):
+                response = self._http.send(request, stream=stream)
+                if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                    break
+                response.close()
+                time.sleep(_BACKOFF * 2 ** attempt)
+            if stream and not _is_streaming_response(response):
+                response.read()  # plain JSON body: callers read .content directly
+            return response
+        response = self._session.post(
         
             self.base_url,
             headers=headers,
-            json=payload,
+            data=body,
             verify=False,
-            timeout=120
+            timeout=(5, 120),
+            stream=stream
         )
         return response
  
+    async def _amake_request(self, payload: Union[Dict, bytes], http=None):
+        """Async variant of _make_request over the shared HTTP/2 AsyncClient (needs httpx)"""
+        if http is None:
+            if httpx is None:
+                raise RuntimeError("Async requests need httpx: pip install 'httpx[http2]'")
+            # Pooled connections belong to the loop that opened them: a client from an
+            # earlier asyncio.run() would fail with "Event loop is closed"
+            loop = asyncio.get_running_loop()
+            if self._ahttp is None or self._ahttp_loop is not loop:
+                self._ahttp = _httpx_client(async_=True)
+                self._ahttp_loop = loop
+            http = self._ahttp
+        body = payload if isinstance(payload, bytes) else _json_dumps(payload)
+        for attempt in range(_MAX_RETRIES + 1):
+            response = await http.post(self.base_url, headers=self._headers, content=body)
+            if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                return response
+            await asyncio.sleep(_BACKOFF * 2 ** attempt)
+ 
  
     class ChatCompletion:
 
@@ -270,7 +515,14 @@ class SnowflakeCortexClient:
 
             self.client = client
 
-            self.completions = self  # Support OpenAI-style API: client.chat.completions.create()
+            self._content_extractor = None  # extractor that matched the last response
+
+        @property
+        def completions(self):
+
+            """Support OpenAI-style API: client.chat.completions.create()"""
+
+            return self
 
         def create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
 
@@ -300,41 +552,83 @@ class SnowflakeCortexClient:
 
             # Build payload
 
-            payload = self.client._build_payload(messages, None)
+            payload = self.client._build_payload_bytes(messages)
 
             # Make request
 
-            response = self.client._make_request(payload)
+            response = self.client._make_request(payload, stream=stream)
 
-            # Handle response
+            return self._handle_response(response, stream)
 
-            if response.status_code == 200:
+        async def acreate(self, model: str, messages: List[Dict[str, str]], **kwargs):
+            """Async create() over the shared HTTP/2 AsyncClient (non-streaming)"""
+            payload = self.client._build_payload_bytes(messages)
+            response = await self.client._amake_request(payload)
+            return self._handle_response(response)
 
-                try:
+        def create_batch(self, batch: List[List[Dict[str, str]]],
+                         max_concurrency: int = 8) -> List[CompletionResponse]:
+            """
+            Run one non-streaming completion per message list concurrently
 
-                    # Try parsing as JSON first
+            Args:
+                batch: List of message lists, one per completion
+                max_concurrency: Maximum number of requests in flight
 
-                    data = response.json()
+            Returns:
+                CompletionResponse objects in the order of batch
 
-                    # Extract content from various possible response formats
+            Blocks until the whole batch is done; async callers can instead
+            await asyncio.gather() over acreate() calls.
+            """
+            payloads = [self.client._build_payload_bytes(messages) for messages in batch]
+            if httpx is not None:
+                batch_run = self._gather_with_semaphore(payloads, max_concurrency)
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    return asyncio.run(batch_run)
+                # Inside a running event loop (async handler, Jupyter) asyncio.run() raises:
+                # run the batch on its own loop in a worker thread instead
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    return pool.submit(asyncio.run, batch_run).result()
+            # No httpx: fan out over the pooled requests session instead
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                responses = pool.map(self.client._make_request, payloads)
+                return [self._handle_response(response) for response in responses]
+
+        async def _gather_with_semaphore(self, payloads: List[bytes], max_concurrency: int):
+            # A fresh AsyncClient per batch: pooled connections are bound to the
+            # event loop that asyncio.run() closes on return
+            semaphore = asyncio.Semaphore(max_concurrency)
+            async with _httpx_client(async_=True) as http:
+                async def post(payload):
+                    async with semaphore:
+                        return await self.client._amake_request(payload, http)
+                responses = await asyncio.gather(*[post(payload) for payload in payloads])
+            return [self._handle_response(response) for response in responses]
+
+        def _handle_response(self, response, stream: bool = False):
+            """Turn an API response into a CompletionResponse (or StreamingChunk iterator)"""
+            # Handle response
 
-                    content = None
+            if response.status_code == 200 and stream and _is_streaming_response(response):
 
-                    if 'text' in data:
+                # Real streaming endpoint: emit chunks as they arrive
 
-                        content = data['text']
+                return self._stream_response(response)
 
-                    elif 'response' in data:
+            elif response.status_code == 200:
 
-                        content = data['response']
+                try:
 
-                    elif 'choices' in data and len(data['choices']) > 0:
+                    # Try parsing as JSON first
 
-                        content = data['choices'][0].get('message', {}).get('content', '')
+                    data = _json_loads(response.content)
 
-                    else:
+                    # Extract content from various possible response formats
 
-                        content = str(data)
+                    content = self._extract_content(data)
 
                     # Handle streaming vs non-streaming
 
@@ -366,7 +660,7 @@ class SnowflakeCortexClient:
 
                     # If not JSON, treat as plain text
 
-                    print(f"DEBUG: JSON decode error, treating as plain text: {e}")
+                    logger.debug("JSON decode error, treating as plain text: %s", e)
 
                     content = response.text
 
@@ -394,6 +688,55 @@ class SnowflakeCortexClient:
 
                     raise Exception(f" Error Response: {response.text}")
 
+        def _extract_content(self, data) -> str:
+
+            """Response text, trying the extractor that matched last time first"""
+
+            extractor = self._content_extractor
+            if extractor is not None:
+                try:
+                    return extractor(data)
+                except (KeyError, IndexError, TypeError):
+                    pass  # response shape changed: rescan
+            for key, extractor in _EXTRACTORS:
+                if key in data:
+                    try:
+                        content = extractor(data)
+                    except IndexError:
+                        continue  # empty choices list
+                    self._content_extractor = extractor
+                    return content
+            return str(data)
+
+        def _stream_response(self, response):
+            """
+            Yield StreamingChunk objects as events arrive on a streaming response
+            (SSE "data: {...}" lines or NDJSON), without buffering the whole body
+            """
+            if httpx is not None and isinstance(response, httpx.Response):
+                lines = response.iter_lines()
+            else:
+                # requests guesses ISO-8859-1 (or nothing) without a charset; these streams are UTF-8
+                lines = (line.decode('utf-8', 'replace') for line in response.iter_lines())
+            try:
+                for line in lines:
+                    if not line or line.startswith(':'):
+                        continue
+                    if line.startswith('data:'):
+                        line = line[5:].strip()
+                    if line == '[DONE]':
+                        break
+                    try:
+                        event = _json_loads(line)
+                    except ValueError:
+                        logger.debug("Skipping non-JSON stream line: %.100s", line)
+                        continue
+                    text = _event_text(event)
+                    if text:
+                        yield StreamingChunk(text)
+            finally:
+                response.close()
+
         def _simulate_streaming(self, content: str):
 
             """
@@ -410,21 +753,25 @@ class SnowflakeCortexClient:
 
             """
 
-            # Split content into words for more natural streaming
+            # Stream word by word, slicing lazily instead of splitting the whole text
 
-            words = content.split(' ')
+            start = 0
 
-            for i, word in enumerate(words):
+            end = content.find(' ')
 
-                # Add space before word except for first word
+            while end != -1:
 
-                chunk_text = word if i == 0 else ' ' + word
+                yield StreamingChunk(content[start:end])
 
-                yield StreamingChunk(chunk_text)
+                start = end  # every word after the first carries its leading space
+
+                end = content.find(' ', end + 1)
 
                 # Small delay to simulate streaming (optional, can remove for faster response)
 
                 # time.sleep(0.01)
+
+            yield StreamingChunk(content[start:])
  
 def create_snowflake_client(api_key: str, base_url: str, model: str = "snowflake-llama-3.3-70b"):
 